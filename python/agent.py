@@ -14,12 +14,17 @@ from livekit.agents import (
     function_tool,
     ConversationItemAddedEvent,
     llm,
+    stt,
+    tts,
 )
 from livekit.plugins import noise_cancellation, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+from core.export import CallMetadataExporter
 from core.logging.logger import LOG
 from core.models import CallMetadata, CallClassification
+from core.profiling import CallProfiler
+from core.recording import SessionRecorder
 
 load_dotenv(".env.local")
 
@@ -117,6 +122,7 @@ async def _extract_call_metadata(
 async def _on_session_end(
     ctx: agents.JobContext,
     call_duration: int,
+    exporter: CallMetadataExporter | None = None,
 ) -> None:
     LOG.info("end session reached!!!!!!!!!!!")
 
@@ -141,15 +147,58 @@ async def _on_session_end(
         )
 
         LOG.info(f"Call metadata: {metadata.model_dump_json()}")
+
+        if exporter:
+            exporter.submit(metadata)
     else:
         LOG.info("No classification generated for session")
 
 
+def create_session(
+    stt_model: stt.STT, llm_model: llm.LLM, tts_model: tts.TTS
+) -> AgentSession:
+    # session replay builds its session here too, so VAD and turn detection match
+    return AgentSession(
+        stt=stt_model,
+        llm=llm_model,
+        tts=tts_model,
+        vad=silero.VAD.load(),
+        turn_detection=MultilingualModel(),
+    )
+
+
 server = AgentServer()
 
 
 @server.rtc_session()
 async def entrypoint(ctx: agents.JobContext):
+    profiler = CallProfiler.from_job(ctx)
+    if profiler:
+        profiler.start()
+
+    call_duration = {"seconds": 0}
+    exporter = CallMetadataExporter.from_env()
+    session_started = False
+
+    # registered before connecting so calls that fail early still get a profile
+    async def shutdown_callback():
+        try:
+            # there is no session to report on if the call ended before it started
+            if session_started:
+                await _on_session_end(
+                    ctx,
+                    call_duration,
+                    exporter,
+                )
+        finally:
+            # bounded drain: records not delivered in time go to the dead letter file
+            if exporter:
+                await exporter.aclose()
+            if profiler:
+                await profiler.aclose()
+
+    ctx.add_shutdown_callback(shutdown_callback)
+
     await ctx.connect()
 
     participant = await ctx.wait_for_participant()
@@ -174,30 +223,24 @@ async def entrypoint(ctx: agents.JobContext):
 
     LOG.info("participant attributes has been fetched")
 
-    call_duration = {"seconds": 0}
-
-    async def shutdown_callback():
-        await _on_session_end(
-            ctx,
-            call_duration,
-        )
-
-    ctx.add_shutdown_callback(shutdown_callback)
-
     instructions = "You are a helpful, friendly voice AI assistant. Your first message should be: 'Hello! How can I help you today?'"
 
     LOG.info("agent has been initialized")
 
-    session = AgentSession(
-        stt=inference.STT("deepgram/nova-2-phonecall", language="en"),
-        llm=inference.LLM("google/gemini-2.5-flash"),
-        tts=inference.TTS(
+    recorder = SessionRecorder.from_env(ctx.room.name)
+
+    session_llm = inference.LLM("google/gemini-2.5-flash")
+    if recorder:
+        session_llm = recorder.wrap_llm(session_llm)
+
+    session = create_session(
+        stt_model=inference.STT("deepgram/nova-2-phonecall", language="en"),
+        llm_model=session_llm,
+        tts_model=inference.TTS(
             "inworld/inworld-tts-1.5-max",
             language="en",
             voice="Craig",
         ),
-        vad=silero.VAD.load(),
-        turn_detection=MultilingualModel(),
     )
 
     await session.start(
@@ -216,6 +259,13 @@ async def entrypoint(ctx: agents.JobContext):
         ),
     )
 
+    session_started = True
+
+    # after start, so the recorder can wrap the room's audio input
+    if recorder:
+        recorder.attach(session)
+        ctx.add_shutdown_callback(recorder.aclose)
+
     call_started_at = datetime.now(tz=timezone.utc)
 
     user_timestamp = datetime.now(tz=timezone.utc)
@@ -0,0 +1,3 @@
+from .webhook import CallMetadataExporter
+
+__all__ = ["CallMetadataExporter"]
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from aiohttp import web
+
+from core.export.webhook import CallMetadataExporter
+from core.models import CallMetadata, IsSpam
+
+
+class StandInServer:
+    """Local HTTP endpoint that accepts batches and optionally fails a share of them."""
+
+    def __init__(
+        self,
+        failure_rate: float = 0.0,
+        *,
+        fail_first: int = 0,
+        failure_status: int = 503,
+    ) -> None:
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.failure_status = failure_status
+        self.received = 0
+        self.requests = 0
+        self.encodings: list[str | None] = []
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.encodings.append(request.headers.get("Content-Encoding"))
+        if self.requests <= self.fail_first or random.random() < self.failure_rate:
+            return web.Response(status=self.failure_status)
+
+        # aiohttp decompresses the gzip body based on Content-Encoding
+        batch = await request.json()
+        self.received += len(batch)
+        return web.Response(status=204)
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/"
+
+    async def aclose(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def _sample_metadata(index: int) -> CallMetadata:
+    return CallMetadata(
+        datetime=datetime.now(),
+        call_duration=random.randint(5, 600),
+        call_transcript="user: hello\nassistant: Hello! How can I help you today?\n"
+        * 20,
+        reason_for_call=f"benchmark call {index}",
+        is_spam=IsSpam.NOT_SPAM,
+    )
+
+
+async def run_benchmark(records: int, failure_rate: float, batch_size: int) -> None:
+    server = StandInServer(failure_rate=failure_rate)
+    await server.start()
+    dead_letter = Path(tempfile.mkdtemp()) / "dead_letter.jsonl"
+
+    exporter = CallMetadataExporter(
+        [server.url],
+        dead_letter_path=dead_letter,
+        batch_size=batch_size,
+        batch_interval=0.05,
+        max_queue_size=records,
+        backoff_base=0.01,
+    )
+
+    started = time.perf_counter()
+    for index in range(records):
+        exporter.submit(_sample_metadata(index))
+    submitted = time.perf_counter() - started
+
+    await exporter.aclose(timeout=60)
+    elapsed = time.perf_counter() - started
+    await server.aclose()
+
+    dead = len(dead_letter.read_text().splitlines()) if dead_letter.exists() else 0
+    print(f"records:        {records}")
+    print(f"submit time:    {submitted * 1000:.2f}ms")
+    print(f"delivered:      {server.received} in {server.requests} requests")
+    print(f"dead lettered:  {dead}")
+    print(f"throughput:     {server.received / elapsed:.0f} records/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the call metadata exporter")
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.records, args.failure_rate, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+from pathlib import Path
+
+import aiohttp
+
+from core.logging.logger import LOG
+from core.models import CallMetadata
+
+ENDPOINTS_ENV = "CALL_METADATA_ENDPOINTS"
+DEAD_LETTER_ENV = "CALL_METADATA_DEAD_LETTER"
+DEFAULT_DEAD_LETTER = "./dead_letter/call_metadata.jsonl"
+DEFAULT_DRAIN_TIMEOUT = 5.0
+
+
+class CallMetadataExporter:
+    def __init__(
+        self,
+        endpoints: list[str],
+        *,
+        dead_letter_path: str | Path = DEFAULT_DEAD_LETTER,
+        batch_size: int = 50,
+        batch_interval: float = 1.0,
+        max_queue_size: int = 1000,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        request_timeout: float = 10.0,
+        pool_size: int = 10,
+    ) -> None:
+        self._endpoints = endpoints
+        self._dead_letter_path = Path(dead_letter_path)
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._request_timeout = request_timeout
+        self._pool_size = pool_size
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_queue_size)
+        self._session: aiohttp.ClientSession | None = None
+        self._worker: asyncio.Task | None = None
+        # batch being sent, keyed by the endpoints that have not accepted it yet
+        self._undelivered: dict[str, list[dict]] = {}
+        self._dead_letters: list[str] = []
+        self._dead_letter_task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._closed = False
+
+    @classmethod
+    def from_env(cls) -> "CallMetadataExporter | None":
+        endpoints = [
+            url.strip()
+            for url in os.getenv(ENDPOINTS_ENV, "").split(",")
+            if url.strip()
+        ]
+        if not endpoints:
+            return None
+
+        return cls(
+            endpoints,
+            dead_letter_path=os.getenv(DEAD_LETTER_ENV) or DEFAULT_DEAD_LETTER,
+        )
+
+    def _ensure_started(self) -> None:
+        if self._worker:
+            return
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self._pool_size, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=self._request_timeout),
+        )
+        self._worker = asyncio.create_task(self._run())
+
+    def submit(self, metadata: CallMetadata) -> None:
+        record = metadata.model_dump(mode="json", by_alias=True)
+
+        if self._closed:
+            self._dead_letter([record], reason="exporter closed")
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            LOG.warning("Call metadata queue full, writing record to dead letter")
+            self._dead_letter([record], reason="queue full")
+            return
+        self._wakeup.set()
+
+    async def _next_batch(self) -> list[dict]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._batch_interval
+
+        try:
+            while len(batch) < self._batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+
+                # a closing exporter sends what it has instead of waiting for more
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._closed:
+                    break
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            self._dead_letter(batch, reason="not delivered before shutdown")
+            raise
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._send_batch(batch)
+            except asyncio.CancelledError:
+                self._dead_letter_undelivered()
+                raise
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send_batch(self, batch: list[dict]) -> None:
+        body = gzip.compress(json.dumps(batch, ensure_ascii=False).encode())
+        self._undelivered = {endpoint: batch for endpoint in self._endpoints}
+        await asyncio.gather(
+            *(self._post(endpoint, body, batch) for endpoint in self._endpoints)
+        )
+
+    async def _post(self, endpoint: str, body: bytes, batch: list[dict]) -> None:
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        }
+        error: str | None = None
+
+        for attempt in range(self._max_retries + 1):
+            try:
+                async with self._session.post(
+                    endpoint, data=body, headers=headers
+                ) as resp:
+                    if resp.status < 400:
+                        self._undelivered.pop(endpoint, None)
+                        return
+                    error = f"HTTP {resp.status}"
+                    # client errors other than rate limiting will not succeed on retry
+                    if resp.status < 500 and resp.status != 429:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+
+            if attempt < self._max_retries:
+                delay = min(self._backoff_max, self._backoff_base * 2**attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        LOG.error(f"Failed to deliver {len(batch)} call records to {endpoint}: {error}")
+        self._undelivered.pop(endpoint, None)
+        self._dead_letter(batch, reason=error, endpoint=endpoint)
+
+    def _dead_letter_undelivered(self) -> None:
+        for endpoint, batch in self._undelivered.items():
+            self._dead_letter(
+                batch, reason="not delivered before shutdown", endpoint=endpoint
+            )
+        self._undelivered = {}
+
+    def _dead_letter_queued(self) -> None:
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            self._dead_letter(pending, reason="not delivered before shutdown")
+
+    def _dead_letter(
+        self, batch: list[dict], *, reason: str | None, endpoint: str | None = None
+    ) -> None:
+        # endpoint None means the records were never sent to any endpoint
+        for record in batch:
+            entry = {"endpoint": endpoint, "reason": reason, "record": record}
+            self._dead_letters.append(json.dumps(entry, ensure_ascii=False))
+
+        if self._dead_letter_task is None or self._dead_letter_task.done():
+            self._dead_letter_task = asyncio.create_task(self._flush_dead_letters())
+
+    async def _flush_dead_letters(self) -> None:
+        while self._dead_letters:
+            lines, self._dead_letters = self._dead_letters, []
+            await asyncio.to_thread(self._append_dead_letters, lines)
+
+    def _write_dead_letters(self) -> None:
+        lines, self._dead_letters = self._dead_letters, []
+        if lines:
+            self._append_dead_letters(lines)
+
+    def _append_dead_letters(self, lines: list[str]) -> None:
+        self._dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._dead_letter_path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def aclose(self, timeout: float = DEFAULT_DRAIN_TIMEOUT) -> None:
+        """Sends what is queued, waiting at most `timeout` seconds.
+
+        Records still undelivered after that are written to the dead letter file.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+
+        if self._worker:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                LOG.warning("Timed out draining call metadata exporter")
+
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+
+        self._dead_letter_queued()
+        if self._dead_letter_task:
+            await self._dead_letter_task
+        await asyncio.to_thread(self._write_dead_letters)
+
+        if self._session:
+            await self._session.close()
+
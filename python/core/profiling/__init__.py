@@ -0,0 +1,3 @@
+from .sampler import CallProfiler
+
+__all__ = ["CallProfiler"]
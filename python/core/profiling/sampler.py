@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import CodeType, FrameType
+
+from livekit import agents
+
+from core.logging.logger import LOG
+
+PROFILING_ENV = "CALL_PROFILING"
+PROFILE_DIR_ENV = "CALL_PROFILE_DIR"
+PROFILE_INTERVAL_ENV = "CALL_PROFILE_INTERVAL_MS"
+DEFAULT_PROFILE_DIR = "./profiles"
+DEFAULT_INTERVAL_MS = 10.0
+
+
+def _profiling_requested(metadata: str) -> bool:
+    if os.getenv(PROFILING_ENV, "").lower() in ("1", "true", "yes"):
+        return True
+
+    try:
+        data = json.loads(metadata) if metadata else {}
+    except json.JSONDecodeError:
+        return False
+    return isinstance(data, dict) and bool(data.get("profile"))
+
+
+def _interval_from_env() -> float:
+    value = os.getenv(PROFILE_INTERVAL_ENV)
+    if not value:
+        return DEFAULT_INTERVAL_MS
+
+    try:
+        interval_ms = float(value)
+    except ValueError:
+        interval_ms = 0.0
+    if interval_ms <= 0:
+        LOG.warning(
+            f"Invalid {PROFILE_INTERVAL_ENV}={value!r}, using {DEFAULT_INTERVAL_MS}ms"
+        )
+        return DEFAULT_INTERVAL_MS
+    return interval_ms
+
+
+class CallProfiler:
+    """Samples the event loop thread's stack and writes collapsed stacks on stop."""
+
+    def __init__(
+        self,
+        room_name: str,
+        *,
+        directory: str | Path = DEFAULT_PROFILE_DIR,
+        interval_ms: float = DEFAULT_INTERVAL_MS,
+    ) -> None:
+        self._room_name = room_name
+        self._directory = Path(directory)
+        self._interval = interval_ms / 1000
+        self._samples: Counter[tuple[str, ...]] = Counter()
+        self._labels: dict[CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._target_id = 0
+        self._started_at = datetime.now(tz=timezone.utc)
+
+    @classmethod
+    def from_job(cls, ctx: agents.JobContext) -> "CallProfiler | None":
+        if not _profiling_requested(ctx.job.metadata):
+            return None
+
+        return cls(
+            ctx.job.room.name,
+            directory=os.getenv(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR,
+            interval_ms=_interval_from_env(),
+        )
+
+    def start(self) -> None:
+        # must be called from the event loop thread, which is the one sampled
+        self._target_id = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name="call-profiler", daemon=True
+        )
+        self._thread.start()
+        LOG.info(f"call profiler started for room {self._room_name}")
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_qualname} ({os.path.basename(code.co_filename)})"
+            self._labels[code] = label
+        return label
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame: FrameType | None = sys._current_frames().get(self._target_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.append(f"room:{self._room_name}")
+                self._samples[tuple(reversed(stack))] += 1
+
+    def _write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    async def aclose(self) -> None:
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+        stamp = self._started_at.strftime("%Y%m%dT%H%M%S")
+        path = self._directory / f"{self._room_name}-{stamp}.collapsed"
+        await asyncio.to_thread(self._write, path)
+        LOG.info(
+            f"call profile written: {path} ({sum(self._samples.values())} samples)"
+        )
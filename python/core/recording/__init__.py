@@ -0,0 +1,4 @@
+from .format import RecordingReader, RecordKind
+from .recorder import SessionRecorder
+
+__all__ = ["RecordingReader", "RecordKind", "SessionRecorder"]
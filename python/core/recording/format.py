@@ -0,0 +1,85 @@
+import gzip
+import json
+import struct
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+FORMAT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+CHUNK_PATTERN = "chunk-{index:05d}.bin.gz"
+
+# kind (u8), seconds since session start (f64), payload length (u32)
+_RECORD_HEADER = struct.Struct("<BdI")
+# sample rate (u32), channels (u16), samples per channel (u32)
+_AUDIO_HEADER = struct.Struct("<IHI")
+
+
+class RecordKind(IntEnum):
+    ITEM = 1
+    TOOLS = 2
+    GENERATION = 3
+    STATE = 4
+    METRICS = 5
+    AUDIO = 6
+    TRANSCRIPT = 7
+
+
+class Record(NamedTuple):
+    kind: RecordKind
+    offset: float
+    payload: Any
+
+
+class AudioChunk(NamedTuple):
+    sample_rate: int
+    num_channels: int
+    samples_per_channel: int
+    pcm: bytes
+
+
+def encode_audio(offset: float, chunk: AudioChunk) -> bytes:
+    payload = (
+        _AUDIO_HEADER.pack(
+            chunk.sample_rate, chunk.num_channels, chunk.samples_per_channel
+        )
+        + chunk.pcm
+    )
+    return _RECORD_HEADER.pack(RecordKind.AUDIO, offset, len(payload)) + payload
+
+
+def encode_event(kind: RecordKind, offset: float, data: dict[str, Any]) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return _RECORD_HEADER.pack(kind, offset, len(payload)) + payload
+
+
+def _decode(kind: RecordKind, payload: bytes) -> Any:
+    if kind == RecordKind.AUDIO:
+        header = _AUDIO_HEADER.unpack_from(payload)
+        return AudioChunk(*header, payload[_AUDIO_HEADER.size :])
+    return json.loads(payload)
+
+
+class RecordingReader:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST_NAME).read_text())
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported recording version: {self.manifest.get('version')}"
+            )
+
+    def chunks(self) -> list[Path]:
+        return sorted(self.path.glob("chunk-*.bin.gz"))
+
+    def records(self, *kinds: RecordKind) -> Iterator[Record]:
+        for chunk_path in self.chunks():
+            data = gzip.decompress(chunk_path.read_bytes())
+            pos = 0
+            while pos < len(data):
+                kind, offset, length = _RECORD_HEADER.unpack_from(data, pos)
+                pos += _RECORD_HEADER.size
+                kind = RecordKind(kind)
+                if not kinds or kind in kinds:
+                    yield Record(kind, offset, _decode(kind, data[pos : pos + length]))
+                pos += length
@@ -0,0 +1,320 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    AgentSession,
+    AgentStateChangedEvent,
+    APIConnectOptions,
+    ConversationItemAddedEvent,
+    FunctionToolsExecutedEvent,
+    MetricsCollectedEvent,
+    UserInputTranscribedEvent,
+    UserStateChangedEvent,
+    io,
+    llm,
+)
+
+from core.logging.logger import LOG
+from core.recording.format import (
+    CHUNK_PATTERN,
+    FORMAT_VERSION,
+    MANIFEST_NAME,
+    AudioChunk,
+    RecordKind,
+    encode_audio,
+    encode_event,
+)
+
+RECORDING_DIR_ENV = "SESSION_RECORDING_DIR"
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+
+# the wrapped stream retries on its own, retrying the wrapper would repeat requests
+_NO_RETRY = APIConnectOptions(max_retry=0)
+
+
+class SessionRecorder:
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        room_name: str,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    ) -> None:
+        self.path = Path(directory)
+        self._room_name = room_name
+        self._chunk_bytes = chunk_bytes
+        self._started_at = datetime.now(tz=timezone.utc)
+        self._t0 = time.monotonic()
+        self._buffer = bytearray()
+        self._chunk_index = 0
+        self._record_count = 0
+        self._writes: set[asyncio.Task] = set()
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, room_name: str) -> "SessionRecorder | None":
+        root = os.getenv(RECORDING_DIR_ENV)
+        if not root:
+            return None
+
+        stamp = datetime.now(tz=timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return cls(Path(root) / f"{room_name}-{stamp}", room_name=room_name)
+
+    def wrap_llm(self, model: llm.LLM) -> llm.LLM:
+        return RecordingLLM(model, self)
+
+    def attach(self, session: AgentSession, *, audio: bool = True) -> None:
+        """Starts recording a session; call it after `session.start()`.
+
+        Audio is taken from the session's own input, after noise cancellation, so
+        replay feeds VAD and turn detection the frames they saw on the call.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._write_manifest()
+
+        if audio and session.input.audio:
+            session.input.audio = RecordingAudioInput(self, source=session.input.audio)
+
+        session.on("conversation_item_added", self._on_item_added)
+        session.on("function_tools_executed", self._on_tools_executed)
+        session.on("user_state_changed", self._on_user_state_changed)
+        session.on("agent_state_changed", self._on_agent_state_changed)
+        session.on("metrics_collected", self._on_metrics_collected)
+        session.on("user_input_transcribed", self._on_user_input_transcribed)
+        LOG.info(f"session recording enabled: {self.path}")
+
+    def _offset(self) -> float:
+        return time.monotonic() - self._t0
+
+    def _append(self, kind: RecordKind, data: dict[str, Any]) -> None:
+        self._append_record(encode_event(kind, self._offset(), data))
+
+    def _append_record(self, record: bytes) -> None:
+        if self._closed:
+            return
+
+        self._buffer += record
+        self._record_count += 1
+        if len(self._buffer) >= self._chunk_bytes:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        chunk_path = self.path / CHUNK_PATTERN.format(index=self._chunk_index)
+        self._chunk_index += 1
+
+        task = asyncio.create_task(asyncio.to_thread(_write_chunk, chunk_path, data))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def record_generation(self, data: dict[str, Any]) -> None:
+        self._append(RecordKind.GENERATION, data)
+
+    def record_audio(self, frame: rtc.AudioFrame) -> None:
+        chunk = AudioChunk(
+            sample_rate=frame.sample_rate,
+            num_channels=frame.num_channels,
+            samples_per_channel=frame.samples_per_channel,
+            pcm=bytes(frame.data),
+        )
+        self._append_record(encode_audio(self._offset(), chunk))
+
+    def _on_item_added(self, ev: ConversationItemAddedEvent) -> None:
+        self._append(
+            RecordKind.ITEM,
+            {
+                "role": ev.item.role,
+                "text": ev.item.text_content,
+                "interrupted": ev.item.interrupted,
+            },
+        )
+
+    def _on_tools_executed(self, ev: FunctionToolsExecutedEvent) -> None:
+        calls = []
+        for call, output in ev.zipped():
+            calls.append(
+                {
+                    "name": call.name,
+                    "call_id": call.call_id,
+                    "is_error": output.is_error if output else False,
+                    "duration": (
+                        output.created_at - call.created_at if output else None
+                    ),
+                }
+            )
+
+        self._append(RecordKind.TOOLS, {"calls": calls})
+
+    def _on_user_state_changed(self, ev: UserStateChangedEvent) -> None:
+        self._append(
+            RecordKind.STATE,
+            {"source": "user", "old": ev.old_state, "new": ev.new_state},
+        )
+
+    def _on_agent_state_changed(self, ev: AgentStateChangedEvent) -> None:
+        self._append(
+            RecordKind.STATE,
+            {"source": "agent", "old": ev.old_state, "new": ev.new_state},
+        )
+
+    def _on_metrics_collected(self, ev: MetricsCollectedEvent) -> None:
+        self._append(RecordKind.METRICS, ev.metrics.model_dump(mode="json"))
+
+    def _on_user_input_transcribed(self, ev: UserInputTranscribedEvent) -> None:
+        self._append(
+            RecordKind.TRANSCRIPT,
+            {
+                "transcript": ev.transcript,
+                "is_final": ev.is_final,
+                "language": ev.language,
+            },
+        )
+
+    def _write_manifest(self, **extra) -> None:
+        manifest = {
+            "version": FORMAT_VERSION,
+            "room_name": self._room_name,
+            "started_at": self._started_at.isoformat(),
+            **extra,
+        }
+        (self.path / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+
+        self._flush()
+        self._closed = True
+        await asyncio.gather(*self._writes)
+
+        await asyncio.to_thread(
+            self._write_manifest,
+            duration=self._offset(),
+            records=self._record_count,
+            chunks=self._chunk_index,
+        )
+        LOG.info(f"session recording saved: {self.path}")
+
+
+class RecordingAudioInput(io.AudioInput):
+    """Passes the session's input audio through and records every frame."""
+
+    def __init__(self, recorder: SessionRecorder, *, source: io.AudioInput) -> None:
+        super().__init__(label="SessionRecorder", source=source)
+        self._recorder = recorder
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self.source.__anext__()
+        self._recorder.record_audio(frame)
+        return frame
+
+
+class RecordingLLM(llm.LLM):
+    """Passes chat requests through to another LLM and records each full response."""
+
+    def __init__(self, wrapped: llm.LLM, recorder: SessionRecorder) -> None:
+        super().__init__()
+        self._wrapped = wrapped
+        self._recorder = recorder
+
+    @property
+    def model(self) -> str:
+        return self._wrapped.model
+
+    @property
+    def provider(self) -> str:
+        return self._wrapped.provider
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[Any] | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs: Any,
+    ) -> "RecordingLLMStream":
+        inner = self._wrapped.chat(
+            chat_ctx=chat_ctx, tools=tools, conn_options=conn_options, **kwargs
+        )
+        return RecordingLLMStream(
+            self,
+            inner=inner,
+            recorder=self._recorder,
+            chat_ctx=chat_ctx,
+            tools=tools or [],
+            conn_options=_NO_RETRY,
+        )
+
+    async def aclose(self) -> None:
+        await self._wrapped.aclose()
+
+
+class RecordingLLMStream(llm.LLMStream):
+    def __init__(
+        self,
+        recording_llm: RecordingLLM,
+        *,
+        inner: llm.LLMStream,
+        recorder: SessionRecorder,
+        chat_ctx: llm.ChatContext,
+        tools: list[Any],
+        conn_options: APIConnectOptions,
+    ) -> None:
+        super().__init__(
+            recording_llm, chat_ctx=chat_ctx, tools=tools, conn_options=conn_options
+        )
+        self._inner = inner
+        self._recorder = recorder
+
+    async def _run(self) -> None:
+        text: list[str] = []
+        tool_calls: list[dict[str, str]] = []
+        started = time.perf_counter()
+        ttft: float | None = None
+        completed = False
+
+        try:
+            async with self._inner as stream:
+                async for chunk in stream:
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    if chunk.delta:
+                        if chunk.delta.content:
+                            text.append(chunk.delta.content)
+                        for call in chunk.delta.tool_calls:
+                            tool_calls.append(
+                                {
+                                    "name": call.name,
+                                    "arguments": call.arguments,
+                                    "call_id": call.call_id,
+                                }
+                            )
+                    self._event_ch.send_nowait(chunk)
+            completed = True
+        finally:
+            # interrupted responses are kept so replay hands out the same sequence
+            self._recorder.record_generation(
+                {
+                    "text": "".join(text),
+                    "tool_calls": tool_calls,
+                    "ttft": ttft,
+                    "duration": time.perf_counter() - started,
+                    "completed": completed,
+                }
+            )
+
+
+def _write_chunk(path: Path, data: bytes) -> None:
+    path.write_bytes(gzip.compress(data, compresslevel=6))
@@ -0,0 +1,628 @@
+import argparse
+import asyncio
+import contextlib
+import importlib
+import statistics
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    Agent,
+    AgentSession,
+    APIConnectOptions,
+    CloseEvent,
+    NotGivenOr,
+    io,
+    llm,
+    stt,
+    tts,
+    utils,
+)
+from livekit.agents.inference_runner import _InferenceRunner
+from livekit.agents.job import _JobContextVar
+
+from core.logging.logger import LOG
+from core.recording.format import AudioChunk, RecordingReader, RecordKind
+from core.recording.recorder import SessionRecorder
+
+REPLAY_SAMPLE_RATE = 24000
+DEFAULT_TTS_TTFB = 0.3
+DEFAULT_SECONDS_PER_CHAR = 0.06
+
+
+class RecordedGeneration(BaseModel):
+    text: str = ""
+    tool_calls: list[dict[str, Any]] = Field(default_factory=list)
+    ttft: Optional[float] = None
+
+
+class RecordedTurn(BaseModel):
+    user_text: str
+    offset: float
+    # end of user speech to agent speaking, as the caller heard it
+    latency: Optional[float] = None
+    eou_delay: Optional[float] = None
+    llm_ttft: Optional[float] = None
+    tts_ttfb: Optional[float] = None
+    generations: list[RecordedGeneration] = Field(default_factory=list)
+
+
+class RecordedTranscript(BaseModel):
+    text: str
+    is_final: bool
+    language: Optional[str] = None
+    # seconds of input audio the session had received when the transcript arrived
+    audio_position: float
+
+
+class TurnLatency(BaseModel):
+    index: int
+    user_text: str
+    latency: Optional[float] = None
+    eou_delay: Optional[float] = None
+    recorded_latency: Optional[float] = None
+    recorded_eou_delay: Optional[float] = None
+    recorded_llm_ttft: Optional[float] = None
+    recorded_tts_ttfb: Optional[float] = None
+
+
+class ReplayReport(BaseModel):
+    recording: str
+    agent: str
+    session: str
+    turns: list[TurnLatency]
+
+
+def load_turns(reader: RecordingReader) -> list[RecordedTurn]:
+    turns: list[RecordedTurn] = []
+    user_stopped_at: float | None = None
+    turn_started_at: float | None = None
+    pending_eou: float | None = None
+
+    for record in reader.records(
+        RecordKind.ITEM, RecordKind.STATE, RecordKind.METRICS, RecordKind.GENERATION
+    ):
+        payload = record.payload
+        turn = turns[-1] if turns else None
+
+        if record.kind == RecordKind.ITEM and payload["role"] == "user":
+            turns.append(
+                RecordedTurn(
+                    user_text=payload["text"] or "",
+                    offset=record.offset,
+                    eou_delay=pending_eou,
+                )
+            )
+            turn_started_at = user_stopped_at
+            pending_eou = None
+
+        elif record.kind == RecordKind.STATE:
+            if payload["source"] == "user" and payload["old"] == "speaking":
+                user_stopped_at = record.offset
+            elif (
+                payload["source"] == "agent"
+                and payload["new"] == "speaking"
+                and turn
+                and turn.latency is None
+                and turn_started_at is not None
+            ):
+                turn.latency = record.offset - turn_started_at
+
+        elif record.kind == RecordKind.METRICS:
+            # end of utterance metrics can land on either side of the user item
+            if payload["type"] == "eou_metrics":
+                if turn and turn.eou_delay is None and turn.latency is None:
+                    turn.eou_delay = payload["end_of_utterance_delay"]
+                else:
+                    pending_eou = payload["end_of_utterance_delay"]
+            elif payload["type"] == "llm_metrics" and turn and turn.llm_ttft is None:
+                turn.llm_ttft = payload["ttft"]
+            elif payload["type"] == "tts_metrics" and turn and turn.tts_ttfb is None:
+                turn.tts_ttfb = payload["ttfb"]
+
+        # responses before the first user turn (the greeting) are not replayed
+        elif record.kind == RecordKind.GENERATION and turn:
+            turn.generations.append(
+                RecordedGeneration(
+                    text=payload["text"],
+                    tool_calls=payload["tool_calls"],
+                    ttft=payload.get("ttft"),
+                )
+            )
+
+    return turns
+
+
+def load_audio_input(
+    reader: RecordingReader,
+) -> tuple[list[AudioChunk], list[RecordedTranscript]]:
+    chunks: list[AudioChunk] = []
+    transcripts: list[RecordedTranscript] = []
+    position = 0.0
+
+    for record in reader.records(RecordKind.AUDIO, RecordKind.TRANSCRIPT):
+        if record.kind == RecordKind.AUDIO:
+            chunks.append(record.payload)
+            position += record.payload.samples_per_channel / record.payload.sample_rate
+        else:
+            transcripts.append(
+                RecordedTranscript(
+                    text=record.payload["transcript"],
+                    is_final=record.payload["is_final"],
+                    language=record.payload["language"],
+                    audio_position=position,
+                )
+            )
+
+    return chunks, transcripts
+
+
+class ReplayAudioInput(io.AudioInput):
+    """Feeds recorded input audio to the session at the pace it was captured."""
+
+    def __init__(self, chunks: list[AudioChunk]) -> None:
+        super().__init__(label="Replay")
+        self._chunks = deque(chunks)
+        self._started_at: float | None = None
+        self.position = 0.0
+        self.finished = asyncio.Event()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        if not self._chunks:
+            self.finished.set()
+            raise StopAsyncIteration
+
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+
+        # VAD and endpointing run on wall clock timers, so audio cannot go faster
+        chunk = self._chunks[0]
+        end = self.position + chunk.samples_per_channel / chunk.sample_rate
+        await asyncio.sleep(self._started_at + end - time.monotonic())
+
+        self._chunks.popleft()
+        self.position = end
+        return rtc.AudioFrame(
+            chunk.pcm, chunk.sample_rate, chunk.num_channels, chunk.samples_per_channel
+        )
+
+
+class ReplayAudioOutput(io.AudioOutput):
+    """Discards agent speech but takes as long as playing it would."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            label="Replay", capabilities=io.AudioOutputCapabilities(pause=False)
+        )
+        self._pushed_duration = 0.0
+        self._started_at = 0.0
+        self._interrupted = asyncio.Event()
+        self._playout_task: asyncio.Task | None = None
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+
+        if self._playout_task and not self._playout_task.done():
+            await self._playout_task
+
+        if not self._pushed_duration:
+            self._started_at = time.monotonic()
+            self.on_playback_started(created_at=time.time())
+        self._pushed_duration += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if self._pushed_duration:
+            self._playout_task = asyncio.create_task(self._wait_for_playout())
+
+    def clear_buffer(self) -> None:
+        if self._pushed_duration:
+            self._interrupted.set()
+
+    async def _wait_for_playout(self) -> None:
+        remaining = self._started_at + self._pushed_duration - time.monotonic()
+        try:
+            await asyncio.wait_for(self._interrupted.wait(), max(0.0, remaining))
+            position = min(time.monotonic() - self._started_at, self._pushed_duration)
+            interrupted = True
+        except asyncio.TimeoutError:
+            position = self._pushed_duration
+            interrupted = False
+
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+        self._pushed_duration = 0.0
+        self._interrupted.clear()
+
+
+class ReplaySTT(stt.STT):
+    """Emits the recorded transcripts once the replayed audio reaches them."""
+
+    def __init__(
+        self, transcripts: list[RecordedTranscript], audio: ReplayAudioInput
+    ) -> None:
+        super().__init__(
+            capabilities=stt.STTCapabilities(streaming=True, interim_results=True)
+        )
+        self._pending = deque(transcripts)
+        self._audio = audio
+
+    def due(self) -> Iterator[RecordedTranscript]:
+        while self._pending and self._pending[0].audio_position <= self._audio.position:
+            yield self._pending.popleft()
+
+    async def _recognize_impl(
+        self,
+        buffer: utils.AudioBuffer,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions,
+    ) -> stt.SpeechEvent:
+        raise NotImplementedError("replay only supports streaming recognition")
+
+    def stream(
+        self,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "ReplaySpeechStream":
+        return ReplaySpeechStream(self, conn_options=conn_options)
+
+
+class ReplaySpeechStream(stt.RecognizeStream):
+    def __init__(
+        self, replay_stt: ReplaySTT, *, conn_options: APIConnectOptions
+    ) -> None:
+        super().__init__(stt=replay_stt, conn_options=conn_options)
+        self._replay_stt = replay_stt
+
+    async def _run(self) -> None:
+        async for _ in self._input_ch:
+            for transcript in self._replay_stt.due():
+                self._event_ch.send_nowait(
+                    stt.SpeechEvent(
+                        type=(
+                            stt.SpeechEventType.FINAL_TRANSCRIPT
+                            if transcript.is_final
+                            else stt.SpeechEventType.INTERIM_TRANSCRIPT
+                        ),
+                        alternatives=[
+                            stt.SpeechData(
+                                language=transcript.language or "",
+                                text=transcript.text,
+                            )
+                        ],
+                    )
+                )
+
+
+class ReplayLLM(llm.LLM):
+    """Serves the model outputs captured in a recording instead of calling a provider.
+
+    Responses are matched to user turns by counting user messages in the chat
+    context, so the agent asking at a different point in the turn still gets them.
+    """
+
+    def __init__(self, turns: list[RecordedTurn]) -> None:
+        super().__init__()
+        self._pending = [deque(turn.generations) for turn in turns]
+        self._chunk_count = 0
+
+    @property
+    def unused(self) -> int:
+        return sum(len(pending) for pending in self._pending)
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[Any] | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs: Any,
+    ) -> "ReplayLLMStream":
+        turn = sum(1 for message in chat_ctx.messages() if message.role == "user") - 1
+        pending = self._pending[turn] if 0 <= turn < len(self._pending) else None
+        generation = pending.popleft() if pending else RecordedGeneration()
+        self._chunk_count += 1
+        return ReplayLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            tools=tools or [],
+            conn_options=conn_options,
+            generation=generation,
+            chunk_id=f"replay_{self._chunk_count}",
+        )
+
+
+class ReplayLLMStream(llm.LLMStream):
+    def __init__(
+        self,
+        replay_llm: ReplayLLM,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[Any],
+        conn_options: APIConnectOptions,
+        generation: RecordedGeneration,
+        chunk_id: str,
+    ) -> None:
+        super().__init__(
+            replay_llm, chat_ctx=chat_ctx, tools=tools, conn_options=conn_options
+        )
+        self._generation = generation
+        self._chunk_id = chunk_id
+
+    async def _run(self) -> None:
+        if self._generation.ttft:
+            await asyncio.sleep(self._generation.ttft)
+
+        tool_calls = [
+            llm.FunctionToolCall(
+                name=call["name"],
+                arguments=call["arguments"],
+                call_id=call["call_id"],
+            )
+            for call in self._generation.tool_calls
+        ]
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                id=self._chunk_id,
+                delta=llm.ChoiceDelta(
+                    role="assistant",
+                    content=self._generation.text or None,
+                    tool_calls=tool_calls,
+                ),
+            )
+        )
+
+
+class ReplayTTS(tts.TTS):
+    """Synthesizes silence at the recorded time to first byte and speaking rate."""
+
+    def __init__(self, *, ttfb: float, seconds_per_char: float) -> None:
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=REPLAY_SAMPLE_RATE,
+            num_channels=1,
+        )
+        self.ttfb = ttfb
+        self.seconds_per_char = seconds_per_char
+
+    @classmethod
+    def from_recording(cls, reader: RecordingReader) -> "ReplayTTS":
+        ttfbs: list[float] = []
+        audio_duration = 0.0
+        characters = 0
+        for record in reader.records(RecordKind.METRICS):
+            if record.payload["type"] != "tts_metrics" or record.payload["cancelled"]:
+                continue
+            ttfbs.append(record.payload["ttfb"])
+            audio_duration += record.payload["audio_duration"]
+            characters += record.payload["characters_count"]
+
+        return cls(
+            ttfb=statistics.median(ttfbs) if ttfbs else DEFAULT_TTS_TTFB,
+            seconds_per_char=(
+                audio_duration / characters if characters else DEFAULT_SECONDS_PER_CHAR
+            ),
+        )
+
+    def synthesize(
+        self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
+    ) -> "ReplayChunkedStream":
+        return ReplayChunkedStream(self, input_text=text, conn_options=conn_options)
+
+
+class ReplayChunkedStream(tts.ChunkedStream):
+    def __init__(
+        self, replay_tts: ReplayTTS, *, input_text: str, conn_options: APIConnectOptions
+    ) -> None:
+        super().__init__(
+            tts=replay_tts, input_text=input_text, conn_options=conn_options
+        )
+        self._replay_tts = replay_tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=REPLAY_SAMPLE_RATE,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        await asyncio.sleep(self._replay_tts.ttfb)
+
+        duration = len(self.input_text) * self._replay_tts.seconds_per_char
+        output_emitter.push(bytes(int(duration * REPLAY_SAMPLE_RATE) * 2))
+        output_emitter.flush()
+
+
+class _LocalInferenceExecutor:
+    """Runs local models such as the turn detector in this process.
+
+    Inside a worker they run in a shared inference process owned by the job.
+    """
+
+    def __init__(self) -> None:
+        self._runners: dict[str, _InferenceRunner] = {}
+
+    def initialize(self) -> None:
+        for method, runner_class in _InferenceRunner.registered_runners.items():
+            runner = runner_class()
+            runner.initialize()
+            self._runners[method] = runner
+
+    async def do_inference(self, method: str, data: bytes) -> bytes | None:
+        return await asyncio.to_thread(self._runners[method].run, data)
+
+
+@contextlib.contextmanager
+def _job_context(executor: _LocalInferenceExecutor) -> Iterator[None]:
+    # the turn detector looks up the job's inference executor when it is created
+    token = _JobContextVar.set(SimpleNamespace(inference_executor=executor))
+    try:
+        yield
+    finally:
+        _JobContextVar.reset(token)
+
+
+def _load_attr(spec: str) -> Callable[..., Any]:
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+async def replay(
+    recording: str | Path, agent_spec: str, session_spec: str
+) -> ReplayReport:
+    reader = RecordingReader(recording)
+    recorded = load_turns(reader)
+    chunks, transcripts = load_audio_input(reader)
+    if not chunks:
+        raise ValueError(f"{recording} has no input audio to replay")
+
+    audio_input = ReplayAudioInput(chunks)
+    replay_llm = ReplayLLM(recorded)
+    executor = _LocalInferenceExecutor()
+    with _job_context(executor):
+        session: AgentSession = _load_attr(session_spec)(
+            ReplaySTT(transcripts, audio_input),
+            replay_llm,
+            ReplayTTS.from_recording(reader),
+        )
+    await asyncio.to_thread(executor.initialize)
+
+    session.input.audio = audio_input
+    session.output.audio = ReplayAudioOutput()
+    closed = asyncio.Event()
+
+    @session.on("close")
+    def on_close(ev: CloseEvent):
+        closed.set()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # the replayed session is measured from its own recording, like the original
+        recorder = SessionRecorder(tmp, room_name="replay")
+        await session.start(_load_attr(agent_spec)())
+        recorder.attach(session, audio=False)
+
+        # runs for as long as the call did, unless the agent ends it first
+        waiters = [
+            asyncio.create_task(audio_input.finished.wait()),
+            asyncio.create_task(closed.wait()),
+        ]
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+        await session.aclose()
+        await recorder.aclose()
+        replayed = load_turns(RecordingReader(tmp))
+
+    if replay_llm.unused:
+        LOG.warning(f"{replay_llm.unused} recorded responses were not requested")
+    if len(replayed) != len(recorded):
+        LOG.warning(
+            f"Replay produced {len(replayed)} user turns, the recording has {len(recorded)}"
+        )
+
+    turns = []
+    for index, turn in enumerate(replayed):
+        original = recorded[index] if index < len(recorded) else None
+        turns.append(
+            TurnLatency(
+                index=index,
+                user_text=turn.user_text,
+                latency=turn.latency,
+                eou_delay=turn.eou_delay,
+                recorded_latency=original.latency if original else None,
+                recorded_eou_delay=original.eou_delay if original else None,
+                recorded_llm_ttft=original.llm_ttft if original else None,
+                recorded_tts_ttfb=original.tts_ttfb if original else None,
+            )
+        )
+
+    return ReplayReport(
+        recording=str(recording), agent=agent_spec, session=session_spec, turns=turns
+    )
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def diff_reports(base: ReplayReport, head: ReplayReport) -> list[dict[str, Any]]:
+    head_turns = {turn.index: turn for turn in head.turns}
+    rows = []
+    for turn in base.turns:
+        other = head_turns.get(turn.index)
+        if other is None:
+            continue
+        rows.append(
+            {
+                "index": turn.index,
+                "user_text": turn.user_text,
+                "recorded_ms": _ms(turn.recorded_latency),
+                "base_ms": _ms(turn.latency),
+                "head_ms": _ms(other.latency),
+                "delta_ms": (
+                    _ms(other.latency - turn.latency)
+                    if turn.latency is not None and other.latency is not None
+                    else None
+                ),
+            }
+        )
+    return rows
+
+
+def _format_ms(value: float | None, signed: bool = False) -> str:
+    if value is None:
+        return "-"
+    return f"{value:+.2f}ms" if signed else f"{value:.2f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded agent sessions. The recorded input audio is "
+        "played in real time through the session's VAD and turn detector; STT "
+        "transcripts, model responses and model and TTS timings come from the "
+        "recording, so latency changes from those services are not measured."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="replay a recording offline")
+    run_parser.add_argument("recording")
+    run_parser.add_argument("--agent", default="agent:Assistant")
+    run_parser.add_argument("--session", default="agent:create_session")
+    run_parser.add_argument("--out", required=True)
+
+    diff_parser = commands.add_parser("diff", help="compare two replay reports")
+    diff_parser.add_argument("base")
+    diff_parser.add_argument("head")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = asyncio.run(replay(args.recording, args.agent, args.session))
+        Path(args.out).write_text(report.model_dump_json(indent=2))
+        print(f"Replayed {len(report.turns)} turns -> {args.out}")
+        return
+
+    base = ReplayReport.model_validate_json(Path(args.base).read_text())
+    head = ReplayReport.model_validate_json(Path(args.head).read_text())
+    for row in diff_reports(base, head):
+        print(
+            f"#{row['index']:<3} recorded {_format_ms(row['recorded_ms']):>11}  "
+            f"replay {_format_ms(row['base_ms']):>11} -> "
+            f"{_format_ms(row['head_ms']):>11} "
+            f"({_format_ms(row['delta_ms'], signed=True)})  {row['user_text'][:60]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
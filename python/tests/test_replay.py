@@ -0,0 +1,177 @@
+import gzip
+import json
+
+from core.recording.format import (
+    FORMAT_VERSION,
+    MANIFEST_NAME,
+    AudioChunk,
+    RecordingReader,
+    RecordKind,
+    encode_audio,
+    encode_event,
+)
+from core.recording.replay import load_audio_input, load_turns
+
+
+def _write_recording(path, records: list[bytes]) -> RecordingReader:
+    path.mkdir(parents=True, exist_ok=True)
+    (path / MANIFEST_NAME).write_text(json.dumps({"version": FORMAT_VERSION}))
+    (path / "chunk-00000.bin.gz").write_bytes(gzip.compress(b"".join(records)))
+    return RecordingReader(path)
+
+
+def _user(offset: float, text: str) -> bytes:
+    return encode_event(
+        RecordKind.ITEM, offset, {"role": "user", "text": text, "interrupted": False}
+    )
+
+
+def _state(offset: float, source: str, old: str, new: str) -> bytes:
+    return encode_event(
+        RecordKind.STATE, offset, {"source": source, "old": old, "new": new}
+    )
+
+
+def _eou(offset: float, delay: float) -> bytes:
+    return encode_event(
+        RecordKind.METRICS,
+        offset,
+        {"type": "eou_metrics", "end_of_utterance_delay": delay},
+    )
+
+
+def _generation(offset: float, text: str, tool_calls: list | None = None) -> bytes:
+    return encode_event(
+        RecordKind.GENERATION,
+        offset,
+        {
+            "text": text,
+            "tool_calls": tool_calls or [],
+            "ttft": 0.4,
+            "duration": 0.6,
+            "completed": True,
+        },
+    )
+
+
+def test_turn_latency_runs_from_end_of_speech_to_agent_speaking(tmp_path):
+    reader = _write_recording(
+        tmp_path,
+        [
+            _state(1.0, "user", "listening", "speaking"),
+            _state(2.0, "user", "speaking", "listening"),
+            _user(2.5, "what are your hours"),
+            _generation(2.6, "We are open nine to five."),
+            encode_event(RecordKind.METRICS, 2.9, {"type": "llm_metrics", "ttft": 0.4}),
+            encode_event(RecordKind.METRICS, 3.1, {"type": "tts_metrics", "ttfb": 0.2}),
+            _state(3.1, "agent", "thinking", "speaking"),
+            _state(5.0, "agent", "speaking", "listening"),
+            _state(5.5, "agent", "listening", "speaking"),
+        ],
+    )
+
+    [turn] = load_turns(reader)
+
+    assert turn.user_text == "what are your hours"
+    assert turn.latency == 1.1
+    assert turn.llm_ttft == 0.4
+    assert turn.tts_ttfb == 0.2
+    assert [generation.text for generation in turn.generations] == [
+        "We are open nine to five."
+    ]
+    assert turn.generations[0].ttft == 0.4
+
+
+def test_end_of_utterance_metrics_before_or_after_the_user_item(tmp_path):
+    reader = _write_recording(
+        tmp_path,
+        [
+            _eou(1.0, 0.6),
+            _user(1.0, "hello"),
+            _state(1.5, "agent", "thinking", "speaking"),
+            _user(4.0, "goodbye"),
+            _eou(4.0, 0.7),
+        ],
+    )
+
+    turns = load_turns(reader)
+
+    assert [turn.eou_delay for turn in turns] == [0.6, 0.7]
+
+
+def test_late_end_of_utterance_metrics_go_to_the_next_turn(tmp_path):
+    reader = _write_recording(
+        tmp_path,
+        [
+            _state(0.5, "user", "speaking", "listening"),
+            _user(1.0, "hello"),
+            _state(1.5, "agent", "thinking", "speaking"),
+            # belongs to the user turn being committed next
+            _eou(3.9, 0.8),
+            _user(4.0, "goodbye"),
+        ],
+    )
+
+    turns = load_turns(reader)
+
+    assert [turn.eou_delay for turn in turns] == [None, 0.8]
+
+
+def test_generations_before_the_first_user_turn_are_ignored(tmp_path):
+    reader = _write_recording(
+        tmp_path,
+        [
+            _generation(0.1, "Hello! How can I help you today?"),
+            _user(2.0, "hi"),
+            _generation(2.1, "Hi there."),
+        ],
+    )
+
+    [turn] = load_turns(reader)
+
+    assert [generation.text for generation in turn.generations] == ["Hi there."]
+
+
+def test_later_generations_stay_on_the_previous_user_turn(tmp_path):
+    end_call = {"name": "end_call", "arguments": '{"reason": "done"}', "call_id": "c1"}
+    reader = _write_recording(
+        tmp_path,
+        [
+            _user(1.0, "tell me a story"),
+            _generation(1.1, "Once upon a time"),
+            # interrupted answer, then the silence check prompts
+            _generation(3.0, "Sorry, go ahead."),
+            _generation(8.0, "Are you still there?"),
+            _user(9.0, "bye"),
+            _generation(9.1, "Goodbye!", [end_call]),
+        ],
+    )
+
+    first, second = load_turns(reader)
+
+    assert [generation.text for generation in first.generations] == [
+        "Once upon a time",
+        "Sorry, go ahead.",
+        "Are you still there?",
+    ]
+    assert len(second.generations) == 1
+    assert second.generations[0].text == "Goodbye!"
+    assert second.generations[0].tool_calls == [end_call]
+
+
+def test_transcripts_are_placed_on_the_input_audio_timeline(tmp_path):
+    frame = AudioChunk(
+        sample_rate=16000, num_channels=1, samples_per_channel=160, pcm=bytes(320)
+    )
+    transcript = {"transcript": "hello", "is_final": True, "language": "en"}
+    records = [encode_audio(index * 0.01, frame) for index in range(50)]
+    records.insert(30, encode_event(RecordKind.TRANSCRIPT, 0.3, transcript))
+    reader = _write_recording(tmp_path, records)
+
+    chunks, transcripts = load_audio_input(reader)
+
+    assert len(chunks) == 50
+    assert chunks[0] == frame
+    assert len(transcripts) == 1
+    assert transcripts[0].text == "hello"
+    assert round(transcripts[0].audio_position, 6) == 0.3
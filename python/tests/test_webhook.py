@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from core.export.benchmark import StandInServer
+from core.export.webhook import CallMetadataExporter
+from core.models import CallMetadata, IsSpam
+
+
+def _metadata(index: int) -> CallMetadata:
+    return CallMetadata(
+        datetime=datetime(2026, 1, 1, 12, 0),
+        call_duration=30,
+        call_transcript="user: hello\nassistant: Hello! How can I help you today?",
+        reason_for_call=f"test call {index}",
+        is_spam=IsSpam.NOT_SPAM,
+    )
+
+
+async def _export(server: StandInServer, dead_letter, records: int, **kwargs) -> None:
+    await server.start()
+    exporter = CallMetadataExporter(
+        [server.url],
+        dead_letter_path=dead_letter,
+        batch_interval=0.05,
+        backoff_base=0.01,
+        **kwargs,
+    )
+    try:
+        for index in range(records):
+            exporter.submit(_metadata(index))
+        await exporter.aclose(timeout=10)
+    finally:
+        await server.aclose()
+
+
+def _dead_letters(path) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_delivers_gzipped_batches(tmp_path):
+    server = StandInServer()
+    dead_letter = tmp_path / "dead_letter.jsonl"
+    asyncio.run(_export(server, dead_letter, 25, batch_size=10))
+
+    assert server.received == 25
+    assert server.requests == 3
+    assert server.encodings == ["gzip"] * 3
+    assert _dead_letters(dead_letter) == []
+
+
+def test_retries_server_errors_until_delivered(tmp_path):
+    server = StandInServer(fail_first=2)
+    dead_letter = tmp_path / "dead_letter.jsonl"
+    asyncio.run(_export(server, dead_letter, 5, max_retries=3))
+
+    assert server.received == 5
+    assert server.requests == 3
+    assert _dead_letters(dead_letter) == []
+
+
+def test_permanent_failures_go_to_dead_letter(tmp_path):
+    server = StandInServer(failure_rate=1.0)
+    dead_letter = tmp_path / "dead_letter.jsonl"
+    asyncio.run(_export(server, dead_letter, 3, max_retries=2))
+
+    assert server.received == 0
+    assert server.requests == 3
+    entries = _dead_letters(dead_letter)
+    assert len(entries) == 3
+    assert {entry["endpoint"] for entry in entries} == {server.url}
+    assert entries[0]["reason"] == "HTTP 503"
+    assert entries[0]["record"]["reasonForCall"] == "test call 0"
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    server = StandInServer(failure_rate=1.0, failure_status=400)
+    dead_letter = tmp_path / "dead_letter.jsonl"
+    asyncio.run(_export(server, dead_letter, 1, max_retries=3))
+
+    assert server.requests == 1
+    assert len(_dead_letters(dead_letter)) == 1
+
+
+def test_shutdown_dead_letters_only_undelivered_endpoints(tmp_path):
+    healthy = StandInServer()
+    failing = StandInServer(failure_rate=1.0)
+    dead_letter = tmp_path / "dead_letter.jsonl"
+
+    async def run() -> None:
+        await healthy.start()
+        await failing.start()
+        exporter = CallMetadataExporter(
+            [healthy.url, failing.url],
+            dead_letter_path=dead_letter,
+            batch_interval=0.05,
+            backoff_base=10.0,
+        )
+        try:
+            exporter.submit(_metadata(0))
+            await exporter.aclose(timeout=0.5)
+        finally:
+            await healthy.aclose()
+            await failing.aclose()
+
+    asyncio.run(run())
+
+    assert healthy.received == 1
+    entries = _dead_letters(dead_letter)
+    assert [entry["endpoint"] for entry in entries] == [failing.url]
+    assert entries[0]["reason"] == "not delivered before shutdown"
+
+
+async def _run_shutdown_callback(exporter: CallMetadataExporter) -> float:
+    # mirrors the shutdown callback in agent.py: submit on session end, then drain
+    started = time.perf_counter()
+    try:
+        exporter.submit(_metadata(0))
+    finally:
+        await exporter.aclose()
+    return time.perf_counter() - started
+
+
+def test_shutdown_callback_delivers_before_returning(tmp_path, monkeypatch):
+    server = StandInServer()
+    dead_letter = tmp_path / "dead_letter.jsonl"
+
+    async def run() -> float:
+        await server.start()
+        monkeypatch.setenv("CALL_METADATA_ENDPOINTS", server.url)
+        monkeypatch.setenv("CALL_METADATA_DEAD_LETTER", str(dead_letter))
+        try:
+            return await _run_shutdown_callback(CallMetadataExporter.from_env())
+        finally:
+            await server.aclose()
+
+    elapsed = asyncio.run(run())
+
+    assert server.received == 1
+    assert not dead_letter.exists()
+    # the drain does not wait out the batch interval
+    assert elapsed < 1.0
+
+
+def test_shutdown_callback_dead_letters_before_returning(tmp_path, monkeypatch):
+    server = StandInServer(failure_rate=1.0, failure_status=400)
+    dead_letter = tmp_path / "dead_letter.jsonl"
+
+    async def run() -> None:
+        await server.start()
+        monkeypatch.setenv("CALL_METADATA_ENDPOINTS", server.url)
+        monkeypatch.setenv("CALL_METADATA_DEAD_LETTER", str(dead_letter))
+        try:
+            await _run_shutdown_callback(CallMetadataExporter.from_env())
+        finally:
+            await server.aclose()
+
+    asyncio.run(run())
+
+    entries = _dead_letters(dead_letter)
+    assert [entry["endpoint"] for entry in entries] == [server.url]
+
+
+def test_empty_dead_letter_env_uses_default(monkeypatch):
+    monkeypatch.setenv("CALL_METADATA_ENDPOINTS", "http://127.0.0.1:1/")
+    monkeypatch.setenv("CALL_METADATA_DEAD_LETTER", "")
+
+    exporter = CallMetadataExporter.from_env()
+
+    assert str(exporter._dead_letter_path) == "dead_letter/call_metadata.jsonl"